@@ -0,0 +1,420 @@
+# End-to-end benchmark of the pipeline's stream logic, run against local stand-ins.
+#
+# The chain mirrors the deployed project:
+#   opc-ua-source -> http-sink -> http-api-source -> http-data-normalization
+#   -> http-config-enricher -> influxdb2-sink
+#
+# Kafka topics are replaced by in-process queues that (de)serialize JSON like the real
+# topics do, the http-api-source by a stub HTTP receiver, and InfluxDB by a stub
+# `/api/v2/write` endpoint. Each service's own functions and sinks are imported from
+# its directory, so the numbers move with the code under test.
+import argparse
+import gzip
+import importlib.util
+import json
+import math
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import deque
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+# settings of the deployed pipeline (see quix.yaml and http-data-normalization/main.py)
+WINDOW_DURATION_MS = 1000
+WINDOW_STEP_MS = 200
+WINDOW_GRACE_MS = 500
+MACHINE_CONFIG = {
+    "editor_name": "benchmark",
+    "field_scalar": 0.5,
+    "mapping": {"T001": "sensor_1", "T002": "sensor_2"},
+}
+
+
+def load_service(directory: str, module_name: str, file_name: str = "main.py"):
+    """
+    Import a module from a service directory under a unique module name; the service
+    directories are not packages and all share the same file names.
+    """
+    # services import their sibling modules (e.g. metrics.py) by plain name
+    service_dir = str(REPO_ROOT / directory)
+    sys.path.insert(0, service_dir)
+    try:
+        spec = importlib.util.spec_from_file_location(module_name, REPO_ROOT / directory / file_name)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+    finally:
+        sys.path.remove(service_dir)
+    return module
+
+
+class LocalTopic:
+    """
+    In-process stand-in for a Kafka topic: a FIFO of JSON-serialized messages.
+    The produce timestamp of the originating source message travels in the headers,
+    like a tracing header would.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._messages = deque()
+
+    def produce(self, key, value, headers):
+        self._messages.append((key, json.dumps(value).encode(), headers))
+
+    def consume(self):
+        while self._messages:
+            key, value, headers = self._messages.popleft()
+            yield key, json.loads(value), headers
+
+
+class Stage:
+    """
+    Accumulates throughput and memory figures for one pipeline stage.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.messages_in = 0
+        self.messages_out = 0
+        self.elapsed = 0.0
+        self.peak_memory = 0
+
+    def run(self, func, *args):
+        tracing = tracemalloc.is_tracing()
+        if tracing:
+            tracemalloc.reset_peak()
+            baseline = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        messages_in, messages_out = func(*args)
+        self.elapsed += time.perf_counter() - start
+        if tracing:
+            self.peak_memory = max(self.peak_memory, tracemalloc.get_traced_memory()[1] - baseline)
+        self.messages_in += messages_in
+        self.messages_out += messages_out
+
+    def as_dict(self) -> dict:
+        return {
+            "stage": self.name,
+            "messages_in": self.messages_in,
+            "messages_out": self.messages_out,
+            "seconds": round(self.elapsed, 4),
+            "throughput_msg_s": round(self.messages_in / self.elapsed, 1) if self.elapsed else None,
+            "peak_memory_kib": round(self.peak_memory / 1024, 1) if self.peak_memory else None,
+        }
+
+
+class HttpReceiver(BaseHTTPRequestHandler):
+    """
+    Stub of http-api-source: accepts `POST /data/<key>` and forwards the body
+    to the `http_data` topic, as the real service does with its producer.
+    """
+    topic: LocalTopic = None
+    latencies: list = None
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        key = self.path.rsplit("/", 1)[-1]
+        trace_ns = body.pop("_bench_ts")
+        self.latencies.append(time.time_ns() - trace_ns)
+        self.topic.produce(key, body, headers=[("bench_ts", trace_ns)])
+        self.send_response(200)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class InfluxStub(BaseHTTPRequestHandler):
+    """
+    Stub of the InfluxDB 2 write API; counts the points and bytes it receives.
+    """
+    points = 0
+    bytes_received = 0
+    requests = 0
+
+    def do_GET(self):
+        # version check done by the sink on setup
+        self.send_response(204)
+        self.send_header("X-Influxdb-Version", "v2.7.11")
+        self.end_headers()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        InfluxStub.bytes_received += len(body)
+        InfluxStub.requests += 1
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        InfluxStub.points += body.count(b"\n") + 1
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+def serve(handler) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class HoppingWindow:
+    """
+    Minimal stand-in for `sdf.hopping_window(...).reduce(...).final()` with a single
+    partition: windows are kept per message key and emitted once the partition's
+    watermark (latest timestamp minus grace) passes their end.
+    """
+
+    def __init__(self, duration_ms, step_ms, grace_ms, initializer, reducer):
+        self.duration_ms = duration_ms
+        self.step_ms = step_ms
+        self.grace_ms = grace_ms
+        self.initializer = initializer
+        self.reducer = reducer
+        self._windows = {}
+        self._latest_ms = 0
+
+    def process(self, key, row, timestamp_ms, trace_ns):
+        advanced = timestamp_ms > self._latest_ms
+        self._latest_ms = max(self._latest_ms, timestamp_ms)
+        watermark = self._latest_ms - self.grace_ms
+        start = timestamp_ms - timestamp_ms % self.step_ms
+        while start > timestamp_ms - self.duration_ms:
+            if start + self.duration_ms > watermark:
+                window = self._windows.get((key, start))
+                if window is None:
+                    window = self._windows[(key, start)] = [self.initializer(row), trace_ns]
+                window[0] = self.reducer(window[0], row)
+                window[1] = max(window[1], trace_ns)
+            start -= self.step_ms
+
+        if not advanced:
+            return
+        expired = [k for k in self._windows if k[1] + self.duration_ms <= watermark]
+        for window_key in sorted(expired, key=lambda k: k[1]):
+            value, window_trace_ns = self._windows.pop(window_key)
+            yield window_key[0], {
+                "start": window_key[1],
+                "end": window_key[1] + self.duration_ms,
+                "value": value,
+            }, window_trace_ns
+
+
+def generate_events(machines: int, tags: int, seconds: float, rate: float):
+    """
+    Yield OPC UA data change notifications in event-time order, formatted like
+    `opc_ua_source.SubHandler` publishes them.
+    """
+    start_ns = 1_700_000_000 * 10 ** 9
+    interval_ns = int(1e9 / rate)
+    for tick in range(int(seconds * rate)):
+        srv_ts = start_ns + tick * interval_ns
+        for machine in range(machines):
+            for tag in range(tags):
+                scale = tag + 1
+                yield f"3D_PRINTER_{machine + 2}", {
+                    "srv_ts": srv_ts,
+                    "connector_ts": time.time_ns(),
+                    "type": "Double",
+                    "val": 80 * scale + 20 * scale * (math.sin(srv_ts / 1e9 + machine) + 1) / 2,
+                    "param": f"T{scale:03d}",
+                    "machine": f"3D_PRINTER_{machine + 2}",
+                }
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def run(args) -> dict:
+    normalization = load_service("http-data-normalization", "http_data_normalization")
+    enricher = load_service("http-config-enricher", "http_config_enricher")
+
+    opc_topic = LocalTopic("generated-opc_ua_data")
+    http_topic = LocalTopic("http_data")
+    normalized_topic = LocalTopic("normalized_data")
+    enriched_topic = LocalTopic("config_enriched_data")
+
+    latencies = {"http-api-source": [], "influxdb2-sink": []}
+
+    HttpReceiver.topic = http_topic
+    HttpReceiver.latencies = latencies["http-api-source"]
+    receiver = serve(HttpReceiver)
+    influx = serve(InfluxStub)
+    InfluxStub.points = InfluxStub.bytes_received = InfluxStub.requests = 0
+
+    os.environ["RECEIVER_URL"] = f"http://127.0.0.1:{receiver.server_port}/data"
+    os.environ["RECEIVER_AUTH_TOKEN"] = "benchmark"
+    http_sink = load_service("http-sink", "http_sink").HttpSink()
+    influx_sink = load_service("influxdb2-sink", "influxdb2_sink", "influxdb2_sink.py").InfluxDB2Sink(
+        token="benchmark",
+        host=f"http://127.0.0.1:{influx.server_port}",
+        organization="quix",
+        bucket="my_bucket",
+        measurement="printers",
+        tags_keys=["machine", "config_editor"],
+        time_setter="timestamp",
+    )
+    influx_sink.setup()
+
+    window = HoppingWindow(
+        WINDOW_DURATION_MS, WINDOW_STEP_MS, WINDOW_GRACE_MS,
+        normalization.window_initializer, normalization.window_reducer,
+    )
+    stages = {name: Stage(name) for name in (
+        "opc-ua-source", "http-sink", "http-data-normalization", "http-config-enricher", "influxdb2-sink",
+    )}
+    offsets = {}
+
+    def next_offset(topic):
+        offsets[topic] = offsets.get(topic, -1) + 1
+        return offsets[topic]
+
+    def source_step(events):
+        for key, event in events:
+            opc_topic.produce(f"http://quix.freeopcua.io/{key}", event, headers=[("bench_ts", time.time_ns())])
+        return len(events), len(events)
+
+    def http_sink_step():
+        count = 0
+        for _, value, headers in opc_topic.consume():
+            # HttpSink only posts the value, so the trace timestamp rides along in the body;
+            # sdf.group_by("machine") re-keys the stream before the sink
+            value["_bench_ts"] = headers[0][1]
+            http_sink.add(value, value["machine"], 0, [], opc_topic.name, 0, next_offset(opc_topic.name))
+            count += 1
+        if count:
+            http_sink.flush()
+        return count, count
+
+    def normalization_step():
+        consumed = produced = 0
+        for key, row, headers in http_topic.consume():
+            consumed += 1
+            row["srv_ts"] = row["srv_ts"] if row["srv_ts"] is not None else row["connector_ts"]
+            timestamp_ms = int(row["srv_ts"] / 1E6)
+            for window_key, finalized, trace_ns in window.process(key, row, timestamp_ms, headers[0][1]):
+                result = normalization.window_finalizer(finalized)
+                normalized_topic.produce(result["machine"], result, headers=[("bench_ts", trace_ns)])
+                produced += 1
+        return consumed, produced
+
+    def enricher_step():
+        count = 0
+        for key, row, headers in normalized_topic.consume():
+            # stands in for sdf.join_lookup() against the QuixConfigurationService
+            row.update(json.loads(json.dumps(MACHINE_CONFIG)))
+            result = enricher.config_apply(row)
+            enriched_topic.produce(result["machine"], result, headers=headers)
+            count += 1
+        return count, count
+
+    def influx_sink_step():
+        pending = []
+        for key, row, headers in enriched_topic.consume():
+            influx_sink.add(row, key, 0, [], enriched_topic.name, 0, next_offset(enriched_topic.name))
+            pending.append(headers[0][1])
+        if pending:
+            # the Application flushes sinks on each checkpoint
+            influx_sink.flush()
+        now = time.time_ns()
+        latencies["influxdb2-sink"].extend(now - ts for ts in pending)
+        return len(pending), len(pending)
+
+    if args.trace_memory:
+        tracemalloc.start()
+
+    events = generate_events(args.machines, args.tags, args.seconds, args.rate)
+    wall_start = time.perf_counter()
+    while True:
+        chunk = [event for _, event in zip(range(args.batch_size), events)]
+        if not chunk:
+            break
+        stages["opc-ua-source"].run(source_step, chunk)
+        stages["http-sink"].run(http_sink_step)
+        stages["http-data-normalization"].run(normalization_step)
+        stages["http-config-enricher"].run(enricher_step)
+        stages["influxdb2-sink"].run(influx_sink_step)
+    wall_elapsed = time.perf_counter() - wall_start
+
+    if args.trace_memory:
+        tracemalloc.stop()
+    receiver.shutdown()
+    influx.shutdown()
+
+    source_messages = stages["opc-ua-source"].messages_in
+    return {
+        "run": {
+            "machines": args.machines,
+            "tags": args.tags,
+            "event_seconds": args.seconds,
+            "rate_per_tag": args.rate,
+            "batch_size": args.batch_size,
+            "trace_memory": args.trace_memory,
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+        },
+        "source_messages": source_messages,
+        "wall_seconds": round(wall_elapsed, 3),
+        "end_to_end_throughput_msg_s": round(source_messages / wall_elapsed, 1),
+        "stages": [stage.as_dict() for stage in stages.values()],
+        "latency_ms": {
+            name: {
+                "p50": round(percentile(values, 50) / 1e6, 2) if values else None,
+                "p99": round(percentile(values, 99) / 1e6, 2) if values else None,
+                "samples": len(values),
+            }
+            for name, values in latencies.items()
+        },
+        "influxdb": {
+            "points": InfluxStub.points,
+            "requests": InfluxStub.requests,
+            "bytes": InfluxStub.bytes_received,
+        },
+    }
+
+
+def print_report(report: dict):
+    print(
+        f"{report['source_messages']} source messages in {report['wall_seconds']}s "
+        f"({report['end_to_end_throughput_msg_s']} msg/s end to end)"
+    )
+    print(f"{'stage':<26}{'in':>9}{'out':>9}{'seconds':>10}{'msg/s':>12}{'peak KiB':>11}")
+    for stage in report["stages"]:
+        print(
+            f"{stage['stage']:<26}{stage['messages_in']:>9}{stage['messages_out']:>9}"
+            f"{stage['seconds']:>10}{stage['throughput_msg_s'] or '-':>12}{stage['peak_memory_kib'] or '-':>11}"
+        )
+    for name, latency in report["latency_ms"].items():
+        print(f"source -> {name}: p50={latency['p50']}ms p99={latency['p99']}ms ({latency['samples']} samples)")
+    influx = report["influxdb"]
+    print(f"influxdb: {influx['points']} points in {influx['requests']} requests, {influx['bytes']} bytes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end benchmark of the pipeline's stream logic")
+    parser.add_argument("--machines", type=int, default=10, help="number of simulated machines")
+    parser.add_argument("--tags", type=int, default=2, help="tags per machine")
+    parser.add_argument("--seconds", type=float, default=30, help="seconds of event time to generate")
+    parser.add_argument("--rate", type=float, default=5, help="updates per tag per event-time second")
+    parser.add_argument("--batch-size", type=int, default=500, help="source messages per processing round")
+    parser.add_argument("--trace-memory", action="store_true", help="record peak memory per stage (slower)")
+    parser.add_argument("--output", help="write the report as JSON to this file")
+    args = parser.parse_args()
+
+    report = run(args)
+    print_report(report)
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
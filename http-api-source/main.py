@@ -8,6 +8,7 @@ from functools import wraps
 from flask_cors import CORS
 
 from setup_logging import get_logger
+from metrics import get_metrics, srv_ts_ms
 from quixstreams import Application
 
 # for local dev, load env vars from a .env file
@@ -21,6 +22,7 @@ topic = quix_app.topic(os.environ["output"])
 producer = quix_app.get_producer()
 
 logger = get_logger()
+metrics = get_metrics("http-api-source")
 
 app = Flask(__name__)
 
@@ -48,6 +50,11 @@ def require_auth(func):
     return wrapper
 
 
+def track_event_lag(data):
+    if metrics.enabled:
+        metrics.event_lag("http-api-source", srv_ts_ms(data))
+
+
 @app.route("/", methods=['GET'])
 def redirect_to_swagger():
     return redirect("/apidocs/")
@@ -55,6 +62,7 @@ def redirect_to_swagger():
 
 @app.route("/data/", methods=['POST'])
 @require_auth
+@metrics.instrument("http-api-source")
 def post_data_without_key():
     """
     Post data without key
@@ -72,7 +80,8 @@ def post_data_without_key():
         description: Data received successfully
     """
     data = request.json
-    logger.debug(f"{data}")
+    logger.debug("%s", data)
+    track_event_lag(data)
 
     producer.produce(topic.name, json.dumps(data))
 
@@ -82,6 +91,7 @@ def post_data_without_key():
 
 @app.route("/data/<key>", methods=['POST'])
 @require_auth
+@metrics.instrument("http-api-source")
 def post_data_with_key(key: str):
     """
     Post data with a key
@@ -103,7 +113,8 @@ def post_data_with_key(key: str):
         description: Data received successfully
     """
     data = request.json
-    logger.debug(f"{data}")
+    logger.debug("%s", data)
+    track_event_lag(data)
 
     producer.produce(topic.name, json.dumps(data), key.encode())
 
@@ -1,17 +1,20 @@
 import logging
+import os
 
 
 def get_logger():
-    
+    # Use DEBUG to see every received payload, else INFO for max performance
+    loglevel = os.getenv("LOGLEVEL", "INFO").upper()
+
     logging.basicConfig(
-        level=logging.DEBUG,
+        level=loglevel,
         format='[%(asctime)s] [%(levelname)s]: %(message)s',
         datefmt='%Y-%m-%d %H:%M:%S'
     )
     
     # Set up logging
     logger = logging.getLogger('waitress')
-    logger.setLevel(logging.DEBUG)  # Set to DEBUG for more detailed output
+    logger.setLevel(loglevel)
     logger.propagate = False  # Prevent the log messages from propagating to the root logger
 
     # Create handlers (console and file handler for example)
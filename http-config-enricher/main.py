@@ -10,10 +10,14 @@ from quixstreams.dataframe.joins.lookups import (
 import os
 from datetime import datetime
 
+from metrics import get_metrics
+
 # for local dev, load env vars from a .env file
 # from dotenv import load_dotenv
 # load_dotenv()
 
+metrics = get_metrics("http-config-enricher")
+
 
 def get_quix_config_lookup(topic: Topic) -> QuixConfigurationService:
     return QuixConfigurationService(
@@ -52,6 +56,7 @@ def main():
     config_topic = app.topic(name=os.environ["CONFIG_TOPIC"])
     output_topic = app.topic(name=os.environ["output"])
     sdf = app.dataframe(topic=data_topic)
+    sdf = metrics.track_stream(sdf, "http-config-enricher")
 
     # The QuixConfigurationService helps manage versioning of configs.
     # It communicates with the `Configuration API svc` to retrieve configs
@@ -83,7 +88,7 @@ def main():
                 jsonpath="mapping"
             ),
         }
-    ).apply(config_apply)
+    ).apply(metrics.instrument("http-config-enricher.config_apply")(config_apply))
 
     # Finish off by writing to the final result to the output topic
     sdf.to_topic(output_topic, key=lambda row: row["machine"])
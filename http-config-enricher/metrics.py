@@ -0,0 +1,229 @@
+# Opt-in per-stage pipeline metrics, served in the Prometheus text format.
+#
+# Every service is built as its own image, so an identical copy of this module
+# lives in each service directory; keep the copies in sync.
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+PROCESSING_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+LAG_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+BATCH_BUCKETS = (1, 5, 10, 50, 100, 500, 1000, 5000, 10000)
+
+HISTOGRAMS = {
+    "pipeline_processing_seconds": ("Time spent processing a message or batch", PROCESSING_BUCKETS),
+    "pipeline_event_lag_seconds": ("Wall clock time minus the event time of a message", LAG_BUCKETS),
+    "pipeline_batch_size": ("Number of messages per batch", BATCH_BUCKETS),
+}
+COUNTERS = {
+    "pipeline_messages_total": "Number of messages processed",
+    "pipeline_errors_total": "Number of messages or batches that failed",
+}
+
+# metrics served on each port; services sharing a process (e.g. in the benchmark) share one endpoint
+_served: dict[int, list["Metrics"]] = {}
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Metrics:
+    """
+    Counters and histograms labelled by service and stage.
+
+    When disabled, every method returns immediately and `instrument` leaves the
+    function untouched, so instrumented code costs next to nothing.
+    """
+
+    def __init__(self, service: str, port: Optional[int] = None):
+        self.service = service
+        self.enabled = port is not None
+        self._counters: dict[tuple[str, str], float] = {}
+        self._histograms: dict[tuple[str, str], _Histogram] = {}
+        self._lock = threading.Lock()
+        if self.enabled:
+            self._serve(port)
+
+    def count(self, stage: str, value: float = 1, name: str = "pipeline_messages_total"):
+        if not self.enabled:
+            return
+        key = (name, stage)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def error(self, stage: str):
+        self.count(stage, name="pipeline_errors_total")
+
+    def observe(self, name: str, stage: str, value: float):
+        if not self.enabled:
+            return
+        key = (name, stage)
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(HISTOGRAMS[name][1])
+            histogram.observe(value)
+
+    def event_lag(self, stage: str, event_time_ms: Optional[float]):
+        """
+        Record how far behind the wall clock a message's event time is.
+        """
+        if self.enabled and event_time_ms is not None:
+            self.observe("pipeline_event_lag_seconds", stage, time.time() - event_time_ms / 1000)
+
+    def batch_size(self, stage: str, size: int):
+        self.observe("pipeline_batch_size", stage, size)
+
+    @contextmanager
+    def processing_time(self, stage: str):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            self.error(stage)
+            raise
+        finally:
+            self.observe("pipeline_processing_seconds", stage, time.perf_counter() - start)
+
+    def instrument(self, stage: str):
+        """
+        Decorator counting the calls of a function and timing them.
+        """
+        def decorator(func):
+            if not self.enabled:
+                return func
+
+            @wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.processing_time(stage):
+                    result = func(*args, **kwargs)
+                self.count(stage)
+                return result
+            return wrapper
+        return decorator
+
+    def track_stream(self, sdf, stage: str, event_time: Optional[Callable[[dict], Optional[float]]] = None):
+        """
+        Count the messages flowing through a StreamingDataFrame and record their
+        event time lag.
+
+        :param event_time: returns a row's event time in milliseconds; defaults to the
+            Kafka message timestamp, which is only the event time once a stage has set it
+        """
+        if not self.enabled:
+            return sdf
+
+        def track(value, key, timestamp, headers):
+            self.count(stage)
+            self.event_lag(stage, event_time(value) if event_time else timestamp)
+
+        return sdf.update(track, metadata=True)
+
+    def snapshot(self):
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {
+                key: (list(h.counts), h.sum, h.count) for key, h in self._histograms.items()
+            }
+        return counters, histograms
+
+    def _serve(self, port: int):
+        if port in _served:
+            _served[port].append(self)
+            return
+        registered = _served[port] = [self]
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = render(registered).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("0.0.0.0", port), Handler)
+        threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+        logger.info(f"Serving metrics for {self.service} on port {port}")
+
+
+def srv_ts_ms(row) -> Optional[float]:
+    """
+    Event time in milliseconds of a raw OPC UA event, taken from its server
+    timestamp in nanoseconds.
+    """
+    if isinstance(row, dict) and isinstance(srv_ts := row.get("srv_ts"), (int, float)):
+        return srv_ts / 1e6
+    return None
+
+
+def render(registered: list[Metrics]) -> str:
+    """
+    Render metrics in the Prometheus text exposition format.
+    """
+    snapshots = [(m.service, *m.snapshot()) for m in registered]
+
+    lines = []
+    for name, description in COUNTERS.items():
+        series = [
+            (service, stage, value)
+            for service, counters, _ in snapshots
+            for (n, stage), value in counters.items() if n == name
+        ]
+        if not series:
+            continue
+        lines += [f"# HELP {name} {description}", f"# TYPE {name} counter"]
+        for service, stage, value in series:
+            lines.append(f'{name}{{service="{service}",stage="{stage}"}} {value}')
+
+    for name, (description, buckets) in HISTOGRAMS.items():
+        series = [
+            (service, stage, data)
+            for service, _, histograms in snapshots
+            for (n, stage), data in histograms.items() if n == name
+        ]
+        if not series:
+            continue
+        lines += [f"# HELP {name} {description}", f"# TYPE {name} histogram"]
+        for service, stage, (counts, total, count) in series:
+            labels = f'service="{service}",stage="{stage}"'
+            cumulative = 0
+            for bound, bucket_count in zip((*buckets, "+Inf"), counts):
+                cumulative += bucket_count
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"{name}_sum{{{labels}}} {total}")
+            lines.append(f"{name}_count{{{labels}}} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def get_metrics(service: str) -> Metrics:
+    """
+    Create the service's metrics; they are only collected and served when
+    the METRICS_PORT environment variable is set.
+    """
+    port = os.environ.get("METRICS_PORT")
+    return Metrics(service=service, port=int(port) if port else None)
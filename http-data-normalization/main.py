@@ -5,10 +5,14 @@ from quixstreams import Application
 import os
 from datetime import datetime
 
+from metrics import get_metrics, srv_ts_ms
+
 # for local dev, load env vars from a .env file
 # from dotenv import load_dotenv
 # load_dotenv()
 
+metrics = get_metrics("http-data-normalization")
+
 
 def window_initializer(row: dict) -> dict:
     return {"machine": row["machine"]}
@@ -39,13 +43,20 @@ def main():
     input_topic = app.topic(name=os.environ["input"], key_deserializer="str")
     output_topic = app.topic(name=os.environ["output"])
     sdf = app.dataframe(topic=input_topic)
+    # the Kafka timestamp is when the HTTP API Source produced the event, so take its server timestamp
+    sdf = metrics.track_stream(sdf, "http-data-normalization", event_time=srv_ts_ms)
 
     sdf["srv_ts"] = sdf.apply(lambda row: row["srv_ts"] if row["srv_ts"] is not None else row["connector_ts"])
     sdf = sdf.set_timestamp(lambda row, *_: int(row["srv_ts"] / 1E6))
 
     # Do StreamingDataFrame operations/transformations here
-    sdf = sdf.hopping_window(1000, 200, 500).reduce(reducer=window_reducer, initializer=window_initializer).final()
-    sdf = sdf.apply(window_finalizer)
+    sdf = sdf.hopping_window(1000, 200, 500).reduce(
+        reducer=metrics.instrument("http-data-normalization.reduce")(window_reducer),
+        initializer=window_initializer,
+    ).final()
+    sdf = sdf.apply(metrics.instrument("http-data-normalization.finalize")(window_finalizer))
+    # windows are stamped with their start, so this lag includes the window duration and grace
+    sdf = metrics.track_stream(sdf, "http-data-normalization.output")
 
     # Finish off by writing to the final result to the output topic
     sdf.to_topic(output_topic, key=lambda row: row["machine"])
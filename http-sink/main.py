@@ -9,10 +9,14 @@ import time
 import requests
 import json
 
+from metrics import get_metrics, srv_ts_ms
+
 # for local dev, you can load env vars from a .env file
 # from dotenv import load_dotenv
 # load_dotenv()
 
+metrics = get_metrics("http-sink")
+
 
 class HttpSink(BatchingSink):
     """
@@ -43,13 +47,16 @@ class HttpSink(BatchingSink):
         Each message is POSTed individually to the gateway with its key.
         """
         attempts_remaining = 3
-        
+        metrics.batch_size("http-sink.write", batch.size)
+
         while attempts_remaining:
             try:
                 for item in batch:
                     message_key = item.key if item.key else "unknown"
                     message_data = item.value
-                    self._post_message(message_key, message_data)
+                    with metrics.processing_time("http-sink.post"):
+                        self._post_message(message_key, message_data)
+                metrics.count("http-sink.write", batch.size)
                 return
             except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
                 attempts_remaining -= 1
@@ -79,6 +86,8 @@ def main():
     http_sink = HttpSink()
     input_topic = app.topic(name=os.environ["input"], key_deserializer="str")
     sdf = app.dataframe(topic=input_topic)
+    # the Kafka timestamp is when the source produced the event, so take its server timestamp
+    sdf = metrics.track_stream(sdf, "http-sink", event_time=srv_ts_ms)
 
     # Do SDF operations/transformations
     sdf = sdf.group_by("machine")
@@ -0,0 +1,447 @@
+import gzip
+import logging
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Hashable, Iterable, Optional, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from quixstreams.models import HeadersTuples
+from quixstreams.sinks import BaseSink, SinkBackpressureError
+
+logger = logging.getLogger(__name__)
+
+MeasurementCallable = Callable[[dict], str]
+KeysCallable = Callable[[dict], Iterable[str]]
+MeasurementSetter = Union[str, MeasurementCallable]
+KeysSetter = Union[Iterable[str], KeysCallable]
+
+
+def _is_retryable(status_code: int) -> bool:
+    # server errors and rate limiting are retried; any other 4xx means the data itself is bad
+    return status_code == 429 or status_code >= 500
+
+
+def _measurement_callable(setter: MeasurementSetter) -> MeasurementCallable:
+    """
+    Accept a callable, a template over the row such as "printers_{config_editor}",
+    or a plain measurement name.
+    """
+    if callable(setter):
+        return setter
+    if "{" in setter:
+        def from_template(row: dict) -> str:
+            try:
+                return setter.format_map(row)
+            except KeyError as e:
+                raise ValueError(
+                    f'Measurement template "{setter}" references column {e}, which the row does not have'
+                ) from None
+        return from_template
+    return lambda row: setter
+
+
+def _keys_callable(setter: KeysSetter) -> Optional[KeysCallable]:
+    if callable(setter):
+        return setter
+    keys = list(setter)
+    return (lambda row: keys) if keys else None
+
+
+def _is_numeric(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _escape_key(key: str) -> str:
+    return str(key).replace("\\", "\\\\").replace(",", "\\,").replace("=", "\\=").replace(" ", "\\ ")
+
+
+def _escape_measurement(measurement: str) -> str:
+    return str(measurement).replace("\\", "\\\\").replace(",", "\\,").replace(" ", "\\ ")
+
+
+def _format_field(value) -> Optional[str]:
+    # bool must be checked before int, since bool is a subclass of int
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, int):
+        return f"{value}i"
+    if isinstance(value, float):
+        # line protocol has no NaN or infinity, and InfluxDB rejects the whole request
+        return repr(value) if math.isfinite(value) else None
+    if isinstance(value, str):
+        return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+    return None
+
+
+def _to_nanoseconds(ts) -> int:
+    """
+    Convert an int (already in nanoseconds), datetime or ISO 8601 string to an
+    epoch in nanoseconds. Naive datetimes are treated as UTC.
+    """
+    if isinstance(ts, int):
+        return ts
+    if isinstance(ts, str):
+        ts = datetime.fromisoformat(ts)
+    if isinstance(ts, datetime):
+        if ts.tzinfo is None:
+            ts = ts.replace(tzinfo=timezone.utc)
+        return int(ts.timestamp() * 1e6) * 1000
+    raise TypeError(f'InfluxDB "time" expects an int, str or datetime, got {type(ts)}')
+
+
+def _parse_retry_after(value: Optional[str], default: float) -> float:
+    """
+    Parse a Retry-After header given either in seconds or as an HTTP-date.
+    """
+    if not value:
+        return default
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return default
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0.0)
+
+
+def to_line_protocol(measurement: str, tags: dict, fields: dict, timestamp_ns: int) -> Optional[str]:
+    """
+    Encode a single point as InfluxDB line protocol.
+    Returns None when the point has no writable fields.
+    """
+    field_set = ",".join(
+        f"{_escape_key(k)}={formatted}"
+        for k, v in fields.items()
+        if (formatted := _format_field(v)) is not None
+    )
+    if not field_set:
+        return None
+    tag_set = "".join(
+        f",{_escape_key(k)}={_escape_key(v)}"
+        for k, v in sorted(tags.items())
+        if v is not None and v != ""
+    )
+    return f"{_escape_measurement(measurement)}{tag_set} {field_set} {timestamp_ns}"
+
+
+class _MeasurementBuffer:
+    def __init__(self):
+        self.lines = []
+        self.size = 0
+        self.created_at = time.monotonic()
+
+
+class InfluxDB2Sink(BaseSink):
+    """
+    A sink writing line protocol to the InfluxDB 2 `/api/v2/write` endpoint.
+
+    The measurement, tags and fields can be chosen per message with templates or
+    callables over the row, e.g. `measurement=lambda row: row["machine"].rsplit("_", 1)[0]`
+    to write each machine type to its own measurement. The measurement is resolved for
+    every row, while the tag and field keys are cached per message key and set of
+    columns, so callables choosing keys must only depend on those.
+
+    Points are buffered per measurement and written as soon as a buffer reaches
+    `max_points` or `max_bytes`, or is older than `max_age`, independently of when
+    the Application commits. The age is only checked when a message arrives, so on a
+    quiet topic points wait for the next checkpoint. Whatever is left is written on
+    each checkpoint, so the at-least-once guarantee is unchanged; points re-sent after
+    a backpressure replay overwrite themselves in InfluxDB.
+
+    Buffers are split into requests of at most `max_points` and `max_bytes`, also when
+    points accumulated during an outage are retried. Requests are written in parallel,
+    and each is retried with exponential backoff on 429 and 5xx responses.
+    """
+
+    def __init__(
+        self,
+        host: str,
+        token: str,
+        organization: str,
+        bucket: str,
+        measurement: MeasurementSetter,
+        tags_keys: KeysSetter = (),
+        fields_keys: KeysSetter = (),
+        time_setter: Optional[str] = None,
+        numeric_fields_only: bool = False,
+        schema_cache_size: int = 10_000,
+        max_points: int = 5000,
+        max_bytes: int = 1_000_000,
+        max_age: float = 1.0,
+        enable_gzip: bool = True,
+        max_parallel_writes: int = 4,
+        max_retries: int = 5,
+        retry_backoff: float = 0.5,
+        max_retry_backoff: float = 30.0,
+        request_timeout: float = 10.0,
+        metrics=None,
+    ):
+        """
+        :param host: InfluxDB host in format "http://<host>:<port>"
+        :param token: InfluxDB access token
+        :param organization: InfluxDB organization name
+        :param bucket: InfluxDB bucket (database) to write to
+        :param measurement: measurement name; also accepts a template over the row
+            such as "printers_{config_editor}", or a callable receiving the row.
+            A template only copies column values, so only use low-cardinality columns.
+        :param tags_keys: keys written as tags; they are removed from the fields.
+            Also accepts a callable receiving the row and returning the keys.
+        :param fields_keys: keys written as fields; also accepts a callable receiving
+            the row and returning the keys. If empty, fields are detected from the
+            remaining columns.
+        :param time_setter: optional column holding the point time, either as an int
+            in nanoseconds, an ISO 8601 string or a datetime. If not set, the Kafka
+            message timestamp is used.
+        :param numeric_fields_only: when detecting fields, only keep numeric columns
+        :param schema_cache_size: maximum number of resolved tag and field keys kept in memory
+        :param max_points: maximum points per write request
+        :param max_bytes: maximum uncompressed bytes per write request
+        :param max_age: seconds a point may wait in the buffer before it is written,
+            checked when messages arrive; otherwise points wait for the next checkpoint
+        :param enable_gzip: gzip the request bodies
+        :param max_parallel_writes: how many write requests may be sent concurrently
+        :param max_retries: retries of a write rejected with 429/5xx or a connection error
+        :param retry_backoff: initial retry delay in seconds, doubled on every retry
+        :param max_retry_backoff: upper bound of the retry delay in seconds
+        :param request_timeout: HTTP request timeout in seconds
+        :param metrics: optional `metrics.Metrics` recording write sizes and latencies
+        """
+        super().__init__()
+        self._url = f"{host.rstrip('/')}/api/v2/write"
+        self._ping_url = f"{host.rstrip('/')}/ping"
+        self._params = {"org": organization, "bucket": bucket, "precision": "ns"}
+        self._headers = {
+            "Authorization": f"Token {token}",
+            "Content-Type": "text/plain; charset=utf-8",
+        }
+        if enable_gzip:
+            self._headers["Content-Encoding"] = "gzip"
+        self._enable_gzip = enable_gzip
+
+        if not callable(tags_keys) and not callable(fields_keys):
+            if overlap := set(tags_keys) & set(fields_keys):
+                raise ValueError(f'Keys {",".join(overlap)} are present in both "fields_keys" and "tags_keys"')
+        self._measurement = _measurement_callable(measurement)
+        self._tags_keys = _keys_callable(tags_keys)
+        self._fields_keys = _keys_callable(fields_keys)
+        self._time_setter = time_setter
+        self._numeric_fields_only = numeric_fields_only
+        self._schema_cache_size = schema_cache_size
+        self._schemas: dict[Hashable, tuple[list[str], list[str]]] = {}
+
+        self._max_points = max_points
+        self._max_bytes = max_bytes
+        self._max_age = max_age
+        self._max_parallel_writes = max_parallel_writes
+        self._max_retries = max_retries
+        self._retry_backoff = retry_backoff
+        self._max_retry_backoff = max_retry_backoff
+        self._request_timeout = request_timeout
+        self._metrics = metrics
+
+        self._buffers: dict[str, _MeasurementBuffer] = {}
+        self._next_deadline: Optional[float] = None
+        # set when a write outside a checkpoint failed; the next flush retries it
+        self._write_failed = False
+        self._session: Optional[requests.Session] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def setup(self):
+        self._session = requests.Session()
+        self._session.headers.update(self._headers)
+        adapter = HTTPAdapter(pool_maxsize=self._max_parallel_writes)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._executor = ThreadPoolExecutor(
+            max_workers=self._max_parallel_writes, thread_name_prefix="influxdb-write"
+        )
+        response = self._session.get(self._ping_url, timeout=self._request_timeout)
+        response.raise_for_status()
+
+    def add(
+        self,
+        value: Any,
+        key: Any,
+        timestamp: int,
+        headers: HeadersTuples,
+        topic: str,
+        partition: int,
+        offset: int,
+    ):
+        if not isinstance(value, dict):
+            raise TypeError(f'Sink "{self.__class__.__name__}" supports only dictionaries, got {type(value)}')
+
+        schema_key = (key, tuple(value))
+        schema = self._schemas.get(schema_key)
+        if schema is None:
+            if len(self._schemas) >= self._schema_cache_size:
+                self._schemas.clear()
+            schema = self._schemas[schema_key] = self._resolve_schema(value)
+        tags_keys, fields_keys = schema
+        measurement = self._measurement(value)
+
+        tags = {k: value[k] for k in tags_keys}
+        if self._numeric_fields_only:
+            # checked per value, since a column's type may differ from row to row
+            fields = {k: v for k in fields_keys if _is_numeric(v := value[k])}
+        else:
+            fields = {k: value[k] for k in fields_keys}
+        ts = value.get(self._time_setter) if self._time_setter else None
+        timestamp_ns = _to_nanoseconds(ts) if ts is not None else timestamp * 1_000_000
+
+        line = to_line_protocol(measurement, tags, fields, timestamp_ns)
+        if line is None:
+            logger.debug("Skipping record without fields; key=%s offset=%s", key, offset)
+            return
+        self._append(measurement, line)
+
+    def _resolve_schema(self, row: dict) -> tuple[list[str], list[str]]:
+        """
+        Resolve the tag keys and field keys of a row.
+        """
+        tags_keys = [k for k in self._tags_keys(row) if k in row] if self._tags_keys else []
+        if self._fields_keys:
+            fields_keys = [k for k in self._fields_keys(row) if k in row]
+        else:
+            excluded = {*tags_keys, self._time_setter}
+            fields_keys = [k for k in row if k not in excluded]
+        return tags_keys, fields_keys
+
+    def _append(self, measurement: str, line: str):
+        buffer = self._buffers.get(measurement)
+        if buffer is None:
+            buffer = self._buffers[measurement] = _MeasurementBuffer()
+            if self._next_deadline is None:
+                self._next_deadline = buffer.created_at + self._max_age
+        buffer.lines.append(line)
+        buffer.size += len(line) + 1
+
+        if self._write_failed:
+            # leave retrying to the next checkpoint instead of hammering a struggling server
+            return
+        if len(buffer.lines) >= self._max_points or buffer.size >= self._max_bytes:
+            self._write_buffers([measurement])
+        elif time.monotonic() >= self._next_deadline:
+            deadline = time.monotonic() - self._max_age
+            self._write_buffers([m for m, b in self._buffers.items() if b.created_at <= deadline])
+
+    def _write_buffers(self, measurements: list[str]):
+        try:
+            self._write_parallel(measurements)
+        except SinkBackpressureError:
+            logger.warning("InfluxDB write failed; retrying on the next checkpoint")
+            self._write_failed = True
+
+    def _write_parallel(self, measurements: list[str]):
+        buffers = [self._buffers.pop(m) for m in measurements]
+        self._next_deadline = min(
+            (b.created_at + self._max_age for b in self._buffers.values()), default=None
+        )
+        batches = [batch for buffer in buffers for batch in self._batches(buffer.lines)]
+        try:
+            if len(batches) == 1:
+                self._write(batches[0])
+            else:
+                futures = [self._executor.submit(self._write, batch) for batch in batches]
+                # let every request finish before reporting a failure
+                wait(futures)
+                for future in futures:
+                    future.result()
+        except SinkBackpressureError:
+            # put unwritten points back so they can be retried; rewriting points is idempotent
+            for measurement, buffer in zip(measurements, buffers):
+                existing = self._buffers.get(measurement)
+                if existing is not None:
+                    buffer.lines.extend(existing.lines)
+                    buffer.size += existing.size
+                self._buffers[measurement] = buffer
+            raise
+
+    def _batches(self, lines: list[str]) -> Iterable[list[str]]:
+        """
+        Split lines into requests of at most `max_points` lines and `max_bytes` bytes.
+        """
+        batch, size = [], 0
+        for line in lines:
+            line_size = len(line) + 1
+            if batch and (len(batch) >= self._max_points or size + line_size > self._max_bytes):
+                yield batch
+                batch, size = [], 0
+            batch.append(line)
+            size += line_size
+        if batch:
+            yield batch
+
+    def _write(self, lines: list[str]):
+        start = time.monotonic()
+        body = "\n".join(lines).encode()
+        if self._enable_gzip:
+            body = gzip.compress(body, compresslevel=1)
+
+        backoff = self._retry_backoff
+        for attempt in range(self._max_retries + 1):
+            try:
+                response = self._session.post(
+                    self._url, params=self._params, data=body, timeout=self._request_timeout
+                )
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                reason, retry_after = str(e), backoff
+            else:
+                if response.ok:
+                    if self._metrics is not None:
+                        self._metrics.batch_size("influxdb2-sink.write", len(lines))
+                        self._metrics.observe(
+                            "pipeline_processing_seconds", "influxdb2-sink.write", time.monotonic() - start
+                        )
+                        self._metrics.count("influxdb2-sink.write", len(lines))
+                    logger.debug(
+                        "Sent data to InfluxDB; total_records=%s bytes=%s time_elapsed=%.2fs",
+                        len(lines), len(body), time.monotonic() - start
+                    )
+                    return
+                if not _is_retryable(response.status_code):
+                    response.raise_for_status()
+                reason = f"HTTP {response.status_code}"
+                retry_after = _parse_retry_after(response.headers.get("Retry-After"), backoff)
+
+            retry_after = min(retry_after, self._max_retry_backoff)
+            if self._metrics is not None:
+                self._metrics.error("influxdb2-sink.write")
+            if attempt == self._max_retries:
+                raise SinkBackpressureError(retry_after=retry_after)
+            logger.warning(f"InfluxDB write failed ({reason}); retrying in {retry_after}s")
+            time.sleep(retry_after)
+            backoff = min(backoff * 2, self._max_retry_backoff)
+
+    def flush(self):
+        """
+        Write everything still buffered; triggered by the Application on checkpoint.
+        """
+        if not self._buffers:
+            return
+        total = sum(len(b.lines) for b in self._buffers.values())
+        start = time.monotonic()
+        try:
+            self._write_parallel(list(self._buffers))
+        finally:
+            # on backpressure the Application replays from the last commit, so drop everything
+            self._buffers.clear()
+            self._next_deadline = None
+            self._write_failed = False
+        logger.info(
+            f"Sent data to InfluxDB; total_records={total} "
+            f"time_elapsed={round(time.monotonic() - start, 2)}s"
+        )
+
+    def on_paused(self):
+        self._buffers.clear()
+        self._next_deadline = None
+        self._write_failed = False
@@ -3,40 +3,55 @@ import os
 
 # import vendor-specific modules
 from quixstreams import Application
-from quixstreams.sinks.core.influxdb3 import InfluxDB3Sink
+from influxdb2_sink import InfluxDB2Sink
+from metrics import get_metrics
 
 # for local dev, load env vars from a .env file
 from dotenv import load_dotenv
 load_dotenv()
 
+metrics = get_metrics("influxdb2-sink")
 
 tag_keys = keys.split(",") if (keys := os.environ.get("INFLUXDB_TAG_KEYS")) else []
 field_keys = keys.split(",") if (keys := os.environ.get("INFLUXDB_FIELD_KEYS")) else []
+# may be a template over low-cardinality columns, e.g. "printers_{config_editor}"
 measurement_name = os.environ.get("INFLUXDB_MEASUREMENT_NAME", "measurement1")
 time_setter = col if (col := os.environ.get("TIMESTAMP_COLUMN")) else None
+numeric_fields_only = os.environ.get("INFLUXDB_NUMERIC_FIELDS_ONLY", "false").lower() == "true"
 
-influxdb_v3_sink = InfluxDB3Sink(
+# the sink writes whenever one of its buffer limits is hit; commits only bound
+# how much is replayed after a failure
+influxdb_v2_sink = InfluxDB2Sink(
     token=os.environ["INFLUXDB_TOKEN"],
     host=os.environ["INFLUXDB_HOST"],
-    organization_id=os.environ["INFLUXDB_ORG"],
+    organization=os.environ["INFLUXDB_ORG"],
+    bucket=os.environ["INFLUXDB_DATABASE"],
+    measurement=measurement_name,
     tags_keys=tag_keys,
     fields_keys=field_keys,
     time_setter=time_setter,
-    database=os.environ["INFLUXDB_DATABASE"],
-    measurement=measurement_name,
+    numeric_fields_only=numeric_fields_only,
+    max_points=int(os.environ.get("BUFFER_SIZE", "1000")),
+    max_bytes=int(os.environ.get("BUFFER_MAX_BYTES", "1000000")),
+    max_age=float(os.environ.get("BUFFER_TIMEOUT", "1")),
+    enable_gzip=os.environ.get("ENABLE_GZIP", "true").lower() == "true",
+    max_parallel_writes=int(os.environ.get("MAX_PARALLEL_WRITES", "4")),
+    max_retries=int(os.environ.get("WRITE_MAX_RETRIES", "5")),
+    retry_backoff=float(os.environ.get("WRITE_RETRY_BACKOFF", "0.5")),
+    metrics=metrics,
 )
 
 
 app = Application(
     consumer_group=os.environ.get("CONSUMER_GROUP_NAME", "influxdb-data-writer"),
     auto_offset_reset="earliest",
-    commit_every=int(os.environ.get("BUFFER_SIZE", "1000")),
-    commit_interval=float(os.environ.get("BUFFER_DELAY", "1")),
+    commit_interval=float(os.environ.get("COMMIT_INTERVAL", "5")),
 )
 input_topic = app.topic(os.environ["input"])
 
 sdf = app.dataframe(input_topic)
-sdf.sink(influxdb_v3_sink)
+sdf = metrics.track_stream(sdf, "influxdb2-sink")
+sdf.sink(influxdb_v2_sink)
 
 
 if __name__ == "__main__":
@@ -62,6 +62,29 @@ fi
     #    echo "Setup failed or already set up, continuing..."
         :
     fi
+
+    # Scrape the pipeline services' Prometheus metrics into their own bucket.
+    if [ -n "${METRICS_SCRAPE_TARGETS}" ]; then
+        METRICS_BUCKET="${METRICS_BUCKET:-pipeline_metrics}"
+        INFLUX_ARGS="--host http://localhost:8086 --token ${DOCKER_INFLUXDB_INIT_ADMIN_TOKEN}"
+        AUTH_HEADER="Authorization: Token ${DOCKER_INFLUXDB_INIT_ADMIN_TOKEN}"
+
+        influx bucket create $INFLUX_ARGS --org "${DOCKER_INFLUXDB_INIT_ORG}" \
+        --name "$METRICS_BUCKET" --retention 168h >/dev/null 2>&1 || :
+        ORG_ID=$(influx org list $INFLUX_ARGS --name "${DOCKER_INFLUXDB_INIT_ORG}" --hide-headers | awk '{print $1}')
+        BUCKET_ID=$(influx bucket list $INFLUX_ARGS --org "${DOCKER_INFLUXDB_INIT_ORG}" \
+        --name "$METRICS_BUCKET" --hide-headers | awk '{print $1}')
+
+        # scrapers persist with the rest of the state, so only add missing ones
+        EXISTING=$(curl -s -H "$AUTH_HEADER" localhost:8086/api/v2/scrapers)
+        for URL in $(echo "$METRICS_SCRAPE_TARGETS" | tr ',' ' '); do
+            if ! echo "$EXISTING" | grep -q "\"$URL\""; then
+                curl -s -o /dev/null -H "$AUTH_HEADER" -H "Content-Type: application/json" \
+                -d "{\"name\": \"$URL\", \"type\": \"prometheus\", \"url\": \"$URL\", \"orgID\": \"$ORG_ID\", \"bucketID\": \"$BUCKET_ID\"}" \
+                localhost:8086/api/v2/scrapers && echo "Scraping $URL into $METRICS_BUCKET"
+            fi
+        done
+    fi
 ) &
 
 # Replace the shell with influxd as the primary process.
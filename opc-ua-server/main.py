@@ -1,5 +1,7 @@
 import asyncio
 import logging
+import os
+import random
 from datetime import datetime
 import time
 import math
@@ -12,15 +14,73 @@ _logger = logging.getLogger(__name__)
 MIN_VALUE = 80
 MAX_VALUE = 100
 
+# load generator settings; the defaults reproduce the original single printer with T001 and T002
+MACHINE_COUNT = int(os.getenv("MACHINE_COUNT", "1"))
+TAGS_PER_MACHINE = int(os.getenv("TAGS_PER_MACHINE", "2"))
+UPDATE_INTERVAL = float(os.getenv("UPDATE_INTERVAL", "0.2"))
+VALUE_PROFILES = os.getenv("VALUE_PROFILE", "sine").split(",")
+REPORT_INTERVAL = float(os.getenv("REPORT_INTERVAL", "10"))
 
-def scale_sin_to_range(min_value, max_value):
+# how often (in seconds) the step profile jumps to a new level
+STEP_PERIOD = 10
+
+
+def scale_sin_to_range(min_value, max_value, phase=0.0):
     # Get the current sine value
-    sine_value = math.sin(time.time())
+    sine_value = math.sin(time.time() + phase)
     # Scale it to the range [80, 100]
     scaled_value = ((sine_value + 1) / 2) * (max_value - min_value) + min_value
     return scaled_value
 
 
+class SimulatedTag:
+    """
+    A single simulated variable, producing values within [min_value, max_value]
+    according to its value profile.
+    """
+
+    def __init__(self, node, profile, min_value, max_value, phase=0.0):
+        if profile not in PROFILES:
+            raise ValueError(f"Unknown value profile '{profile}'; expected one of {list(PROFILES)}")
+        self.nodeid = node.nodeid
+        self.profile = profile
+        self.min_value = min_value
+        self.max_value = max_value
+        self.phase = phase
+        self.value = (min_value + max_value) / 2
+
+    def next_value(self):
+        self.value = PROFILES[self.profile](self)
+        return self.value
+
+
+def sine_profile(tag):
+    return scale_sin_to_range(tag.min_value, tag.max_value, tag.phase)
+
+
+def random_walk_profile(tag):
+    step = random.gauss(0, (tag.max_value - tag.min_value) / 100)
+    return min(max(tag.value + step, tag.min_value), tag.max_value)
+
+
+def step_profile(tag):
+    # jump between a handful of levels, holding each one for STEP_PERIOD seconds
+    level = int((time.time() + tag.phase) // STEP_PERIOD) % 4
+    return tag.min_value + level * (tag.max_value - tag.min_value) / 3
+
+
+def noise_profile(tag):
+    return random.uniform(tag.min_value, tag.max_value)
+
+
+PROFILES = {
+    "sine": sine_profile,
+    "random_walk": random_walk_profile,
+    "step": step_profile,
+    "noise": noise_profile,
+}
+
+
 class SubHandler:
     """
     Subscription Handler. To receive events from server for a subscription
@@ -49,6 +109,17 @@ def multiply(parent, x, y):
     return x * y
 
 
+async def write_tags(server, tags):
+    """
+    Write a new value to every tag in one pass, sharing a single server timestamp per tick.
+    Writes go straight to the address space, so awaiting them in turn is cheaper than
+    wrapping each one in a task.
+    """
+    timestamp = datetime.utcnow()
+    for tag in tags:
+        await server.write_attribute_value(tag.nodeid, ua.DataValue(tag.next_value(), ServerTimestamp=timestamp))
+
+
 async def main():
     server = Server()
     await server.init()
@@ -82,15 +153,29 @@ async def main():
         [f"{idx}:controller", f"{idx}:state"]
     )  # get proxy to our device state variable
     
-    # create directly some objects and variables
-    printer = await server.nodes.objects.add_object(idx, "3D_PRINTER_2")
-    probe1 = await printer.add_variable(idx, "T001", 99.8)
-    probe2 = await printer.add_variable(idx, "T002", 0.1)
-    
-    # Set to be writable by clients
-    await probe1.set_writable()
-    await probe2.set_writable()
-    
+    # create directly some objects and variables; printers are numbered from 2 so that
+    # the first one keeps the original "3D_PRINTER_2" name
+    tags = []
+    for machine_index in range(MACHINE_COUNT):
+        printer = await server.nodes.objects.add_object(idx, f"3D_PRINTER_{machine_index + 2}")
+        for tag_index in range(TAGS_PER_MACHINE):
+            # each tag gets its own range (T001: 80-100, T002: 160-200, ...) like the original probes
+            scale = tag_index + 1
+            probe = await printer.add_variable(idx, f"T{scale:03d}", float(MIN_VALUE * scale))
+            # Set to be writable by clients
+            await probe.set_writable()
+            tags.append(SimulatedTag(
+                node=probe,
+                profile=VALUE_PROFILES[tag_index % len(VALUE_PROFILES)],
+                min_value=MIN_VALUE * scale,
+                max_value=MAX_VALUE * scale,
+                phase=float(machine_index),
+            ))
+    _logger.info(
+        "Simulating %s machines with %s tags each (%s writes per tick every %ss)",
+        MACHINE_COUNT, TAGS_PER_MACHINE, len(tags), UPDATE_INTERVAL
+    )
+
     # creating a default event object
     # The event object automatically will have members for all events properties
     # you probably want to create a custom event type, see other examples
@@ -104,21 +189,30 @@ async def main():
         await myevgen.trigger(message="This is BaseEvent")
 
         # Send an initial value / this could be the current value or a default.
-        await server.write_attribute_value(probe1.nodeid, ua.DataValue(99.8, ServerTimestamp=datetime.utcnow()))
-        await server.write_attribute_value(probe2.nodeid, ua.DataValue(0.9, ServerTimestamp=datetime.utcnow()))
+        await write_tags(server, tags)
         await asyncio.sleep(0.1)
 
+        loop = asyncio.get_running_loop()
+        next_tick = loop.time()
+        report_start, report_writes = next_tick, 0
         while True:
-            # Update probe1 with a scaled sine value
-            scaled_value_1 = scale_sin_to_range(MIN_VALUE, MAX_VALUE)
-            await server.write_attribute_value(probe1.nodeid, ua.DataValue(scaled_value_1, ServerTimestamp=datetime.utcnow()))
-
-            # Update probe2 with a different scaled sine value or another logic
-            scaled_value_2 = scale_sin_to_range(MIN_VALUE*2, MAX_VALUE*2)  # or another logic
-            await server.write_attribute_value(probe2.nodeid, ua.DataValue(scaled_value_2, ServerTimestamp=datetime.utcnow()))
+            await write_tags(server, tags)
+            report_writes += len(tags)
+
+            now = loop.time()
+            if now - report_start >= REPORT_INTERVAL:
+                _logger.info(
+                    "Achieved %.1f writes/s (target %.1f)",
+                    report_writes / (now - report_start), len(tags) / UPDATE_INTERVAL
+                )
+                report_start, report_writes = now, 0
+
+            # schedule against a fixed cadence so slow ticks don't drift the update rate
+            next_tick += UPDATE_INTERVAL
+            if next_tick < now:
+                next_tick = now
+            await asyncio.sleep(next_tick - now)
 
-            await asyncio.sleep(0.2)
-            
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
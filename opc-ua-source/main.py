@@ -1,9 +1,10 @@
 import logging
 import os
 import json
+import dataclasses
 
 from quixstreams import Application
-from opc_ua_source import OpcUaSource
+from opc_ua_source import OpcUaSource, MonitoringConfig
 
 OPC_URL = os.environ["OPC_SERVER_URL"]
 OPC_NAMESPACE = os.environ["OPC_NAMESPACE"]
@@ -12,6 +13,20 @@ TOPIC_NAME = os.environ["output"]
 
 PARAMETER_NAMES_TO_PROCESS = os.environ["PARAMETER_NAMES_TO_PROCESS"].split(',')
 
+# server-side monitored item settings; PARAMETER_MONITORING overrides them per parameter, e.g.
+# {"T001": {"deadband_type": "absolute", "deadband_value": 0.5, "sampling_interval": 100}}
+DEFAULT_MONITORING = MonitoringConfig(
+    deadband_type=os.getenv("DEADBAND_TYPE", "none"),
+    deadband_value=float(os.getenv("DEADBAND_VALUE", "0")),
+    sampling_interval=float(os.getenv("SAMPLING_INTERVAL_MS", "0")),
+    queue_size=int(os.getenv("QUEUE_SIZE", "0")),
+)
+PARAMETER_MONITORING = {
+    name: dataclasses.replace(DEFAULT_MONITORING, **overrides)
+    for name, overrides in json.loads(os.getenv("PARAMETER_MONITORING") or "{}").items()
+}
+CLIENT_DEADBAND = os.getenv("CLIENT_DEADBAND", "auto").lower()
+
 logging.getLogger("asyncua.common.subscription").setLevel(logging.WARNING)
 logging.getLogger("asyncua.client.ua_client.UaClient").setLevel(logging.WARNING)
 logging.basicConfig(level=logging.INFO)
@@ -24,7 +39,15 @@ app = Application(
     loglevel=LOGLEVEL,
 )
 
-opc_ua_source = OpcUaSource("opc_ua_source", OPC_URL, OPC_NAMESPACE, PARAMETER_NAMES_TO_PROCESS)
+opc_ua_source = OpcUaSource(
+    "opc_ua_source",
+    OPC_URL,
+    OPC_NAMESPACE,
+    PARAMETER_NAMES_TO_PROCESS,
+    default_monitoring=DEFAULT_MONITORING,
+    parameter_monitoring=PARAMETER_MONITORING,
+    client_deadband=CLIENT_DEADBAND,
+)
 
 # define the topic using the "output" environment variable
 topic = app.topic(TOPIC_NAME)
@@ -2,13 +2,89 @@ import logging
 import time
 import asyncio
 import json
+import itertools
+import dataclasses
+from dataclasses import dataclass
+from typing import Optional
 
 from asyncua import Client, ua
 from quixstreams.models.topics import Topic
 from quixstreams.sources.base import Source
 
+from metrics import Metrics, get_metrics
+
 logger = logging.getLogger('quixstreams')
 
+DEADBAND_TYPES = {
+    "none": ua.DeadbandType.None_,
+    "absolute": ua.DeadbandType.Absolute,
+    "percent": ua.DeadbandType.Percent,
+}
+
+# when to filter values on the client: only if the server rejects the filter, always, or never
+CLIENT_DEADBAND_MODES = ("auto", "always", "never")
+
+
+@dataclass
+class MonitoringConfig:
+    """
+    Monitored item settings for a single OPC UA parameter.
+
+    deadband_type: one of "none", "absolute" or "percent"
+    deadband_value: absolute change, or percent (0-100) of the EURange
+    sampling_interval: server-side sampling interval in milliseconds
+    queue_size: number of samples the server queues between publishes
+    """
+    deadband_type: str = "none"
+    deadband_value: float = 0.0
+    sampling_interval: float = 0.0
+    queue_size: int = 0
+
+    def __post_init__(self):
+        self.deadband_type = self.deadband_type.lower()
+        if self.deadband_type not in DEADBAND_TYPES:
+            raise ValueError(
+                f"Invalid deadband type '{self.deadband_type}'; "
+                f"expected one of {list(DEADBAND_TYPES)}"
+            )
+
+    @property
+    def has_deadband(self) -> bool:
+        return self.deadband_type != "none" and self.deadband_value > 0
+
+
+class ClientDeadband:
+    """
+    Client-side deadband used when the server cannot apply a DataChangeFilter.
+    Percent deadbands are taken against the node's EURange; without one, the
+    value is applied as an absolute deadband instead.
+    """
+
+    def __init__(self, config: MonitoringConfig, eu_range: Optional[float] = None, node=None):
+        if config.deadband_type == "percent" and not eu_range:
+            logger.warning(
+                f"{node} has no EURange to take a percent deadband against; "
+                f"applying {config.deadband_value} as an absolute deadband"
+            )
+            config = dataclasses.replace(config, deadband_type="absolute")
+        self.config = config
+        self.eu_range = eu_range
+        self._last_value = None
+
+    def passes(self, val) -> bool:
+        if isinstance(val, bool) or not isinstance(val, (int, float)):
+            return True
+        if self._last_value is None:
+            self._last_value = val
+            return True
+        threshold = self.config.deadband_value
+        if self.config.deadband_type == "percent":
+            threshold = self.eu_range * self.config.deadband_value / 100
+        if abs(val - self._last_value) <= threshold:
+            return False
+        self._last_value = val
+        return True
+
 
 class OpcUaSource(Source):
     def __init__(
@@ -18,18 +94,42 @@ class OpcUaSource(Source):
         opc_namespace: str,
         parameters: list[str],
         ignore_processing_errors: bool = False,
-    ) -> None:  
+        default_monitoring: Optional[MonitoringConfig] = None,
+        parameter_monitoring: Optional[dict[str, MonitoringConfig]] = None,
+        client_deadband: str = "auto",
+    ) -> None:
+        """
+        :param default_monitoring: monitored item settings applied to every parameter
+        :param parameter_monitoring: per-parameter overrides of `default_monitoring`,
+            keyed by parameter name
+        :param client_deadband: "auto" filters values client-side only when the server
+            rejects the deadband filter, "always" filters them client-side without
+            asking the server (for servers that accept filters they do not apply),
+            "never" fails when the server rejects the filter
+        """
+        if client_deadband not in CLIENT_DEADBAND_MODES:
+            raise ValueError(
+                f"Invalid client deadband mode '{client_deadband}'; "
+                f"expected one of {list(CLIENT_DEADBAND_MODES)}"
+            )
 
         self.opc_url = opc_url
         self.opc_namespace = opc_namespace
         self.parameters = parameters
         self.ignore_processing_errors = ignore_processing_errors
+        self.default_monitoring = default_monitoring or MonitoringConfig()
+        self.parameter_monitoring = parameter_monitoring or {}
+        self.client_deadband = client_deadband
+        self._client_handles = itertools.count(1)
+        self.metrics: Optional[Metrics] = None
 
         self.tracked_values = {}
 
         super().__init__(name=name, shutdown_timeout=10)
 
     def run(self):
+        # sources run in their own process, so the metrics must be served from here
+        self.metrics = get_metrics("opc-ua-source")
         asyncio.run(self.run_async())
 
     async def run_async(self):
@@ -75,13 +175,14 @@ class OpcUaSource(Source):
             for val in self.tracked_values:
                 # Get the node for the current value
                 myvar = await client.nodes.root.get_child(val)
+                config = self.monitoring_config(val.rsplit(":", 1)[-1])
 
                 # Create a handler and subscription for each node
                 handler = SubHandler(self)
                 sub = await client.create_subscription(10, handler)
 
-                # Subscribe to data changes for the node
-                handle = await sub.subscribe_data_change(myvar)
+                # Subscribe to data changes for the node, filtering on the server when possible
+                handle = await self._monitor(sub, myvar, config, handler)
 
                 # Store the subscription and handle
                 subscriptions[val] = sub
@@ -102,6 +203,59 @@ class OpcUaSource(Source):
                 await sub.unsubscribe(handle)
                 await sub.delete()
 
+    def monitoring_config(self, parameter_name: str) -> MonitoringConfig:
+        return self.parameter_monitoring.get(parameter_name, self.default_monitoring)
+
+    def _monitored_item_request(self, node, config: MonitoringConfig, with_filter: bool):
+        params = ua.MonitoringParameters()
+        params.ClientHandle = next(self._client_handles)
+        params.SamplingInterval = config.sampling_interval
+        params.QueueSize = config.queue_size
+        params.DiscardOldest = True
+        if with_filter:
+            deadband_filter = ua.DataChangeFilter()
+            deadband_filter.Trigger = ua.DataChangeTrigger.StatusValue
+            deadband_filter.DeadbandType = DEADBAND_TYPES[config.deadband_type]
+            deadband_filter.DeadbandValue = config.deadband_value
+            params.Filter = deadband_filter
+
+        request = ua.MonitoredItemCreateRequest()
+        request.ItemToMonitor = ua.ReadValueId(NodeId=node.nodeid, AttributeId=ua.AttributeIds.Value)
+        request.MonitoringMode = ua.MonitoringMode.Reporting
+        request.RequestedParameters = params
+        return request
+
+    async def _monitor(self, sub, node, config: MonitoringConfig, handler: "SubHandler") -> int:
+        if config.has_deadband and self.client_deadband != "always":
+            result = (await sub.create_monitored_items(
+                [self._monitored_item_request(node, config, with_filter=True)]
+            ))[0]
+            if not isinstance(result, ua.StatusCode):
+                return result
+            if self.client_deadband == "never":
+                result.check()
+            logger.warning(
+                f"Server rejected {config.deadband_type} deadband for {node} ({result.name}); "
+                f"falling back to client-side filtering"
+            )
+        if config.has_deadband:
+            handler.deadband = ClientDeadband(config, await self._read_eu_range(node), node)
+
+        result = (await sub.create_monitored_items(
+            [self._monitored_item_request(node, config, with_filter=False)]
+        ))[0]
+        if isinstance(result, ua.StatusCode):
+            result.check()
+        return result
+
+    @staticmethod
+    async def _read_eu_range(node) -> Optional[float]:
+        try:
+            eu_range = await (await node.get_child("0:EURange")).read_value()
+            return eu_range.High - eu_range.Low
+        except ua.UaError:
+            return None
+
     def default_topic(self) -> Topic:
         return Topic(
             name=self.name,
@@ -116,8 +270,14 @@ class SubHandler:
 
     def __init__(self, opcua_source: OpcUaSource):
         self._source = opcua_source
+        self.deadband: Optional[ClientDeadband] = None
 
     async def datachange_notification(self, node, val, data):
+        metrics = self._source.metrics
+        if self.deadband is not None and not self.deadband.passes(val):
+            metrics.count("opc-ua-source.deadband_dropped")
+            return
+        start = time.perf_counter()
         try:
             parent = await node.get_parent()
             machine_browse_name = await parent.read_browse_name()
@@ -126,7 +286,7 @@ class SubHandler:
             parameter_browse_name = await node.read_browse_name()
             parameter_name = parameter_browse_name.Name
 
-            logger.debug(f"Data change event for node {machine_name}: {val}")
+            logger.debug("Data change event for node %s: %s", machine_name, val)
 
             # Extract the DataValue from the data parameter
             data_value = data.monitored_item.Value
@@ -136,6 +296,7 @@ class SubHandler:
 
             if server_timestamp is not None:
                 server_timestamp_nanoseconds = int(server_timestamp.timestamp() * 1e9)
+                metrics.event_lag("opc-ua-source", server_timestamp_nanoseconds / 1e6)
             else:
                 server_timestamp_nanoseconds = None
 
@@ -158,7 +319,10 @@ class SubHandler:
                 key=f'{self._source.opc_namespace}/{machine_name}',
                 value=json_bytes,
             )
+            metrics.count("opc-ua-source")
+            metrics.observe("pipeline_processing_seconds", "opc-ua-source", time.perf_counter() - start)
         except Exception as e:
+            metrics.error("opc-ua-source")
             if not self._source.ignore_processing_errors:
                 logger.error(f"{e}; shutting down source...")
                 self._source.stop()